@@ -1,6 +1,4 @@
 import cv2 as cv
-import numpy as np
-import matplotlib.pyplot as plt
 
 def calculate_dimensions(pts):
     """
@@ -1,10 +1,39 @@
 import numpy as np
 import cv2
-import glob
+import fnmatch
 import pickle
 import os
+from concurrent.futures import ThreadPoolExecutor
 
-def calibrate_camera(images_path, checkerboard_size=(9,7), square_size=20.0, debug=True):
+# Loaded calibrations: filename -> (modification time in ns, (camera_matrix, dist_coeffs))
+_CAL_CACHE = {}
+
+# .npz files are zip archives
+_NPZ_MAGIC = b'PK\x03\x04'
+
+# Undistortion maps: (camera_matrix bytes, dist_coeffs bytes, (w, h)) -> (map1, map2, new_camera_matrix, roi)
+_UNDIST_CACHE = {}
+
+# Same key -> (map1_gpu, map2_gpu, roi) for cv2.cuda.remap
+_UNDIST_GPU_CACHE = {}
+
+def list_images(images_path):
+    """
+    List the files matching a path pattern such as "calibration_images/*.jpg"
+    (only the file name part may contain wildcards), sorted by path.
+    """
+    directory, pattern = os.path.split(images_path)
+    try:
+        with os.scandir(directory or ".") as entries:
+            images = [os.path.join(directory, entry.name) for entry in entries
+                      if fnmatch.fnmatch(entry.name, pattern) and entry.is_file()]
+    except (FileNotFoundError, NotADirectoryError):
+        return []
+    # sorted so that calibrations are reproducible
+    return sorted(images)
+
+def calibrate_camera(images_path, checkerboard_size=(9,7), square_size=20.0, debug=True, max_detection_size=1280,
+                     calibration_flags=cv2.CALIB_USE_LU | cv2.CALIB_FIX_K3):
     """
     Calibrate camera using multiple checkerboard images
     
@@ -13,6 +42,8 @@ def calibrate_camera(images_path, checkerboard_size=(9,7), square_size=20.0, deb
         checkerboard_size: Number of inner corners (width, height)
         square_size: Size of checkerboard square in mm
         debug: Whether to show debug information
+        max_detection_size: Longest image edge (in px) used for the coarse corner detection
+        calibration_flags: Flags passed to cv2.calibrateCamera (LU solver, k3 fixed to 0 by default)
         
     Returns:
         ret: Calibration accuracy
@@ -22,58 +53,59 @@ def calibrate_camera(images_path, checkerboard_size=(9,7), square_size=20.0, deb
         tvecs: Translation vectors
     """
     
-    images = glob.glob(images_path)
+    images = list_images(images_path)
     print(f"Found {len(images)} images at path: {images_path}")
     if len(images) == 0:
         print("ERROR: No images found! Check your path and image format.")
         return None, None, None, None, None
     
-    # Prepare object points (0,0,0), (1,0,0), (2,0,0) ...
-    objp = np.zeros((checkerboard_size[0] * checkerboard_size[1], 3), np.float32)
-    objp[:,:2] = np.mgrid[0:checkerboard_size[0], 0:checkerboard_size[1]].T.reshape(-1, 2)
-    objp *= square_size  # Convert to real-world units (mm)
+    # Prepare object points (0,0,0), (1,0,0), (2,0,0) ... in real-world units (mm)
+    # as one C-contiguous float32 buffer that every view shares (read-only)
+    objp = np.empty((checkerboard_size[0] * checkerboard_size[1], 3), np.float32)
+    xs, ys = np.meshgrid(np.arange(checkerboard_size[0]), np.arange(checkerboard_size[1]), indexing='xy')
+    objp[:,0] = xs.ravel() * square_size
+    objp[:,1] = ys.ravel() * square_size
+    objp[:,2] = 0
+    objp.flags.writeable = False
     
     # Arrays to store object points and image points
     objpoints = []  # 3D points in real world space
     imgpoints = []  # 2D points in image plane
     
-    # Get list of calibration images
+    # Find the chessboard corners
+    # Use more aggressive flags for better detection
+    criteria = (cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_MAX_ITER, 30, 0.001)
+    flags = cv2.CALIB_CB_ADAPTIVE_THRESH + cv2.CALIB_CB_NORMALIZE_IMAGE + cv2.CALIB_CB_FILTER_QUADS
+
+    if debug:
+        # Create a debug directory if it doesn't exist
+        os.makedirs("../calibration_debug", exist_ok=True)
+
+    # The OpenCV calls release the GIL, so the images are processed on a thread pool.
+    # map() keeps the results in the same order as the images.
+    with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+        results = list(executor.map(
+            lambda fname: _detect_one(fname, checkerboard_size, criteria, flags, debug, max_detection_size),
+            images))
+
     successful_images = 0
-    
-    for fname in images:
-        img = cv2.imread(fname)
-        if img is None:
+    image_size = None
+
+    for fname, gray_shape, corners2 in results:
+        if gray_shape is None:
             print(f"Could not read image: {fname}")
             continue
-            
-        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-        
-        # Find the chessboard corners
-        # Use more aggressive flags for better detection
-        criteria = (cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_MAX_ITER, 30, 0.001)
-        flags = cv2.CALIB_CB_ADAPTIVE_THRESH + cv2.CALIB_CB_NORMALIZE_IMAGE + cv2.CALIB_CB_FILTER_QUADS
-        ret, corners = cv2.findChessboardCorners(gray, checkerboard_size, flags)
-        
+
+        image_size = gray_shape[::-1]
+
         # If found, add object points, image points
-        if ret:
+        if corners2 is not None:
             successful_images += 1
-            # Refine corner locations
-            corners2 = cv2.cornerSubPix(gray, corners, (11,11), (-1,-1), criteria)
             objpoints.append(objp)
             imgpoints.append(corners2)
-            
+
             if debug:
                 print(f"Successfully detected corners in: {fname}")
-                # Draw and display the corners
-                img_with_corners = img.copy()
-                cv2.drawChessboardCorners(img_with_corners, checkerboard_size, corners2, ret)
-                
-                # Create a debug directory if it doesn't exist
-                os.makedirs("../calibration_debug", exist_ok=True)
-                
-                # Save the image with corners for debugging
-                base_name = os.path.basename(fname)
-                cv2.imwrite(f"../calibration_debug/corners_{base_name}", img_with_corners)
         else:
             if debug:
                 print(f"Failed to detect corners in: {fname}")
@@ -90,46 +122,148 @@ def calibrate_camera(images_path, checkerboard_size=(9,7), square_size=20.0, deb
     
     # Calibrate camera
     ret, mtx, dist, rvecs, tvecs = cv2.calibrateCamera(
-        objpoints, imgpoints, gray.shape[::-1], None, None)
+        objpoints, imgpoints, image_size, None, None, flags=calibration_flags)
     
     # Calculate reprojection error
-    mean_error = 0
+    # Every view has the same number of corners, so the detected and projected points
+    # are stacked into (views, corners, 2) arrays and the per-view errors
+    # (L2 norm of the residuals / number of corners) are computed in one go
+    imgpoints_arr = np.stack([p.reshape(-1, 2) for p in imgpoints])
+    projected = np.empty_like(imgpoints_arr)
     for i in range(len(objpoints)):
         imgpoints2, _ = cv2.projectPoints(objpoints[i], rvecs[i], tvecs[i], mtx, dist)
-        error = cv2.norm(imgpoints[i], imgpoints2, cv2.NORM_L2)/len(imgpoints2)
-        mean_error += error
+        projected[i] = imgpoints2.reshape(-1, 2)
+
+    residuals = (imgpoints_arr - projected).reshape(len(objpoints), -1)
+    errors = np.linalg.norm(residuals, axis=1) / imgpoints_arr.shape[1]
+    mean_error = errors.mean()
     
-    print(f"Total reprojection error: {mean_error/len(objpoints)}")
+    print(f"Total reprojection error: {mean_error}")
     
     return ret, mtx, dist, rvecs, tvecs
 
+def _detect_one(fname, checkerboard_size, criteria, flags, debug, max_detection_size=1280):
+    """
+    Detect and refine the checkerboard corners of a single calibration image.
+    Images larger than max_detection_size are downscaled for the detection and
+    the corners are then refined on the full resolution image.
+
+    Returns: (fname, gray image shape or None if unreadable, refined corners or None if not found)
+    """
+    # Decode straight to a single channel, only the debug output needs the colour image
+    gray = cv2.imread(fname, cv2.IMREAD_GRAYSCALE)
+    if gray is None:
+        return fname, None, None
+
+    scale = max(1.0, max(gray.shape) / max_detection_size)
+    if scale > 1.0:
+        small = cv2.resize(gray, (int(gray.shape[1] / scale), int(gray.shape[0] / scale)),
+                           interpolation=cv2.INTER_AREA)
+    else:
+        small = gray
+
+    ret, corners = cv2.findChessboardCorners(small, checkerboard_size, flags)
+    if not ret:
+        return fname, gray.shape, None
+
+    if small is not gray:
+        # Map the corners back to full resolution coordinates
+        corners *= (gray.shape[1] / small.shape[1], gray.shape[0] / small.shape[0])
+
+    # Refine corner locations
+    corners2 = cv2.cornerSubPix(gray, corners, (11,11), (-1,-1), criteria)
+
+    if debug:
+        # Draw the corners and save the image for debugging
+        img_with_corners = cv2.imread(fname)
+        cv2.drawChessboardCorners(img_with_corners, checkerboard_size, corners2, ret)
+        base_name = os.path.basename(fname)
+        cv2.imwrite(f"../calibration_debug/corners_{base_name}", img_with_corners)
+
+    return fname, gray.shape, corners2
+
 def save_calibration(filename, camera_matrix, dist_coeffs):
-    """Save camera calibration results to file"""
-    calibration_data = {
-        'camera_matrix': camera_matrix,
-        'dist_coeffs': dist_coeffs
-    }
+    """Save camera calibration results to file (NumPy .npz format)"""
+    # Write through a file object so np.savez doesn't append ".npz" to the filename
     with open(filename, 'wb') as f:
-        pickle.dump(calibration_data, f)
+        np.savez(f, camera_matrix=camera_matrix, dist_coeffs=dist_coeffs)
+
+    # Drop the cached entry for the file we just overwrote
+    _CAL_CACHE.pop(filename, None)
     
 def load_calibration(filename):
-    """Load camera calibration from file"""
+    """Load camera calibration from file (cached until the file changes)"""
+    mtime = os.stat(filename).st_mtime_ns
+    cached = _CAL_CACHE.get(filename)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+
     with open(filename, 'rb') as f:
-        calibration_data = pickle.load(f)
-    return calibration_data['camera_matrix'], calibration_data['dist_coeffs']
+        if f.read(len(_NPZ_MAGIC)) == _NPZ_MAGIC:
+            f.seek(0)
+            with np.load(f) as calibration_data:
+                calibration = (calibration_data['camera_matrix'], calibration_data['dist_coeffs'])
+        else:
+            # Calibration files written by older versions are pickled dicts
+            f.seek(0)
+            calibration_data = pickle.load(f)
+            calibration = (calibration_data['camera_matrix'], calibration_data['dist_coeffs'])
+
+    _CAL_CACHE[filename] = (mtime, calibration)
+    return calibration
+
+def clear_calibration_cache():
+    """Forget all calibrations loaded by load_calibration"""
+    _CAL_CACHE.clear()
+
+def undistort_maps(camera_matrix, dist_coeffs, image_size):
+    """
+    Undistortion maps for images of image_size (w, h), computed once per calibration and size.
+
+    Returns: map1, map2, new_camera_matrix, roi
+    """
+    key = (np.asarray(camera_matrix).tobytes(), np.asarray(dist_coeffs).tobytes(), image_size)
+    maps = _UNDIST_CACHE.get(key)
+    if maps is None:
+        newcameramtx, roi = cv2.getOptimalNewCameraMatrix(
+            camera_matrix, dist_coeffs, image_size, 1, image_size)
+        map1, map2 = cv2.initUndistortRectifyMap(
+            camera_matrix, dist_coeffs, None, newcameramtx, image_size, cv2.CV_16SC2)
+        maps = (map1, map2, newcameramtx, roi)
+        _UNDIST_CACHE[key] = maps
+    return maps
+
+def undistort_maps_gpu(camera_matrix, dist_coeffs, image_size):
+    """
+    Undistortion maps for cv2.cuda.remap, uploaded to the GPU once per calibration and size.
+
+    Returns: map1_gpu, map2_gpu, roi
+    """
+    key = (np.asarray(camera_matrix).tobytes(), np.asarray(dist_coeffs).tobytes(), image_size)
+    maps = _UNDIST_GPU_CACHE.get(key)
+    if maps is None:
+        _, _, newcameramtx, roi = undistort_maps(camera_matrix, dist_coeffs, image_size)
+        # cuda remap only takes separate float maps
+        map1, map2 = cv2.initUndistortRectifyMap(
+            camera_matrix, dist_coeffs, None, newcameramtx, image_size, cv2.CV_32FC1)
+        map1_gpu, map2_gpu = cv2.cuda_GpuMat(), cv2.cuda_GpuMat()
+        map1_gpu.upload(map1)
+        map2_gpu.upload(map2)
+        maps = (map1_gpu, map2_gpu, roi)
+        _UNDIST_GPU_CACHE[key] = maps
+    return maps
 
 def undistort_image(image, camera_matrix, dist_coeffs):
     """Undistort an image using camera calibration parameters"""
     h, w = image.shape[:2]
-    newcameramtx, roi = cv2.getOptimalNewCameraMatrix(
-        camera_matrix, dist_coeffs, (w,h), 1, (w,h))
+    map1, map2, newcameramtx, roi = undistort_maps(camera_matrix, dist_coeffs, (w,h))
     
     # Undistort
-    dst = cv2.undistort(image, camera_matrix, dist_coeffs, None, newcameramtx)
+    dst = cv2.remap(image, map1, map2, cv2.INTER_LINEAR)
     
     # Crop the image (optional)
     x, y, w, h = roi
     if all([x, y, w, h]):  # Check if ROI is valid
         dst = dst[y:y+h, x:x+w]
     
-    return dst
\ No newline at end of file
+    return dst
@@ -1,6 +1,18 @@
 import cv2 as cv
 import numpy as np
-import matplotlib.pyplot as plt
+
+def _median_u8(image):
+    """
+    Median of an np.uint8 image computed from its 256 bin histogram in a single pass
+    (same result as np.median without sorting the pixels).
+    """
+    cumulative_hist = np.cumsum(np.bincount(image.ravel(), minlength=256))
+    n = image.size
+    # values at the two middle positions of the sorted pixels (the same one if n is odd)
+    lower = np.searchsorted(cumulative_hist, (n - 1) // 2, side="right")
+    upper = np.searchsorted(cumulative_hist, n // 2, side="right")
+    return (lower + upper) / 2
+
 
 def auto_canny(image, sigma=0.33, apertureSize=3, L2gradient=False):
     """
@@ -10,11 +22,18 @@ def auto_canny(image, sigma=0.33, apertureSize=3, L2gradient=False):
     L2gradient: formula to calculate image gradients (default is False)
     """
 
-    v = np.median(image)
+    if image.dtype == np.uint8:
+        # already what cv.Canny expects, no copy needed
+        image_u8 = image
+        v = _median_u8(image)
+    else:
+        image_u8 = image.astype(np.uint8)
+        v = np.median(image)
+
     lower = int(max(0, (1.0 - sigma) * v))
     upper = int(min(255, (1.0 + sigma) * v))
     edged = cv.Canny(
-        image.astype(np.uint8),
+        image_u8,
         lower,
         upper,
         apertureSize=apertureSize,
@@ -7,7 +7,8 @@ def reorder(rectangle_corner_points):
     Returns the corners as a (4, 2) array of datatype=np.float32
     """
 
-    rectangle_corner_points = rectangle_corner_points.reshape(4, 2)
+    # float32 from the start, that's what getPerspectiveTransform takes
+    rectangle_corner_points = rectangle_corner_points.reshape(4, 2).astype(np.float32, copy=False)
 
     # if we sum up the x and y values of the coordinates,
     # the least one will be top_left and the greatest one will be bottom_right
@@ -33,4 +34,4 @@ def reorder(rectangle_corner_points):
     bottom_left = temp_corners[bottom_left_idx]
     bottom_right = rectangle_corner_points[bottom_right_idx]
 
-    return np.array([top_left, top_right, bottom_left, bottom_right]).astype(np.float32)
+    return np.array([top_left, top_right, bottom_left, bottom_right], dtype=np.float32)
@@ -22,15 +22,12 @@ def read_actual_dimensions(image_path):
         
     try:
         with open(txt_path, 'r') as f:
-            lines = f.readlines()
-            for line in lines:
-                if line.strip():
-                    values = line.strip().split()
-                    if len(values) >= 2:
-                        width = float(values[0])
-                        height = float(values[1])
-                        return (width, height)
-    except Exception as e:
+            for line in f:
+                values = line.split()
+                # Trailing tokens such as a unit ("7.2 9.5 cm") are ignored
+                if len(values) >= 2:
+                    return (float(values[0]), float(values[1]))
+    except (OSError, ValueError) as e:
         print(f"Error reading actual dimensions: {e}")
         return None
     
@@ -83,12 +80,13 @@ def add_error_metrics_to_image(image, calculated_dimensions, error_metrics):
     height, width = output.shape[:2]
     
     # Add a smaller semi-transparent background
-    overlay = output.copy()
     bg_start_x, bg_start_y = 5, height - 55  # Position at very bottom
     bg_width, bg_height = 280, 50  # Much smaller area
-    cv2.rectangle(overlay, (bg_start_x-3, bg_start_y-3), 
-                 (bg_start_x+bg_width, bg_start_y+bg_height), (255, 255, 255), -1)
-    cv2.addWeighted(overlay, 0.6, output, 0.4, 0, output)
+    # Only the strip under the background changes, so only it is blended
+    # (0.6 * white + 0.4 * image)
+    strip_x, strip_y = bg_start_x-3, max(0, bg_start_y-3)
+    strip = output[strip_y:bg_start_y+bg_height+1, strip_x:bg_start_x+bg_width+1]
+    cv2.addWeighted(strip, 0.4, strip, 0, 0.6 * 255, strip)
     
     # Use very small font size and compact format
     font_size = 0.35
@@ -105,4 +103,4 @@ def add_error_metrics_to_image(image, calculated_dimensions, error_metrics):
     cv2.putText(output, f"Rel: W={error_metrics['rel_error_width']:.1f}% H={error_metrics['rel_error_height']:.1f}%", 
                (bg_start_x+5, y_offset), cv2.FONT_HERSHEY_SIMPLEX, font_size, (0, 0, 0), 1)
     
-    return output
\ No newline at end of file
+    return output
@@ -1,10 +1,5 @@
 import cv2 as cv
 import numpy as np
-import matplotlib.pyplot as plt
-
-def contour_perimeter(cnt):
-    return cv.arcLength(cnt, closed=True)
-
 
 def find_object_of_interest(perspective_transformed_img):
     """
@@ -13,34 +8,48 @@ def find_object_of_interest(perspective_transformed_img):
     the A4 paper in the Perspective Transformed Image.
     """
 
-    h, s, v = cv.split(cv.cvtColor(perspective_transformed_img, cv.COLOR_BGR2HSV))
+    # with an OpenCL device available, the per-pixel stages below run on it through
+    # the transparent API (UMat); only the final mask is brought back for findContours
+    use_opencl = cv.ocl.haveOpenCL() and cv.ocl.useOpenCL()
+    src = cv.UMat(perspective_transformed_img) if use_opencl else perspective_transformed_img
 
-    # the 'h' channel has very erratic output
-    # we blank it out and then merge the blank 'h_0' channel with the 's' and 'v' channels
-    # operating only on the 's' channel may have been enough but we have seen that merging
-    # the 's' and 'v' channels along with 'h_0' produces better result when thresholded
+    hsv = cv.cvtColor(src, cv.COLOR_BGR2HSV)
 
-    h_0 = np.zeros_like(h)
-    sv = cv.merge((h_0, s, v))
-    _, thresh_sv = cv.threshold(
-        cv.GaussianBlur(sv, (3, 3), 0, 0), np.mean(sv) / 2, 255, cv.THRESH_BINARY
-    )
+    # the 'h' channel has very erratic output so it is left out entirely.
+    # the threshold is the mean of the (blanked 'h', 's', 'v') image halved,
+    # i.e. the sum of the 's' and 'v' means divided by 6
 
-    # but we have to add these two more steps as the threshodled image is in "HSV" color space
-    # but we need it to be grayscaled and then thresholded for contour detection
-    # directly converting the 'sv' image to 'gray' and then thresholding
-    # doesn't produce desired result
+    _, s_mean, v_mean, _ = cv.mean(hsv)
+    thresh_value = (s_mean + v_mean) / 6
 
-    sv_rgb = cv.cvtColor(thresh_sv, cv.COLOR_HSV2RGB)
-    sv_gray = cv.cvtColor(sv_rgb, cv.COLOR_RGB2GRAY)
-    _, thresh_img = cv.threshold(sv_gray, 220, 255, cv.THRESH_BINARY_INV)
+    # thresholding the 's' and 'v' channels separately and converting the result
+    # back through HSV -> RGB -> GRAY with an inverted 220 threshold only ever keeps
+    # the pixels that are saturated or dark, so we build that mask directly:
+    # object = (s > thresh_value) or (v <= thresh_value)
+
+    s = cv.GaussianBlur(cv.extractChannel(hsv, 1), (3, 3), 0, 0)
+    v = cv.GaussianBlur(cv.extractChannel(hsv, 2), (3, 3), 0, 0)
+    _, thresh_s = cv.threshold(s, thresh_value, 255, cv.THRESH_BINARY)
+    _, thresh_v = cv.threshold(v, thresh_value, 255, cv.THRESH_BINARY_INV)
+    thresh_img = cv.bitwise_or(thresh_s, thresh_v)
+    if use_opencl:
+        thresh_img = thresh_img.get()
 
     cnts, _ = cv.findContours(thresh_img, cv.RETR_EXTERNAL, cv.CHAIN_APPROX_NONE)
 
-    obj_of_interest_cnt = sorted(cnts, key=contour_perimeter, reverse=True)[0]
+    # the object of interest is the contour with the largest perimeter
+    perimeters = np.fromiter(
+        (cv.arcLength(cnt, closed=True) for cnt in cnts), dtype=np.float64, count=len(cnts)
+    )
+    obj_idx = int(perimeters.argmax())
+    obj_of_interest_cnt = cnts[obj_idx]
 
+    # the hull is taken first so that only its few vertices are approximated, the
+    # approximation (with the contour's own perimeter, as before) keeps the
+    # measured size of the object the same as approximating the whole contour
+    obj_of_interest_chull = cv.convexHull(obj_of_interest_cnt)
     obj_of_interest_approx_cnt = cv.approxPolyDP(
-        obj_of_interest_cnt, 0.005 * contour_perimeter(obj_of_interest_cnt), closed=True
+        obj_of_interest_chull, 0.005 * perimeters[obj_idx], closed=True
     )
     obj_of_interest_chull = cv.convexHull(obj_of_interest_approx_cnt)
 
@@ -1,12 +1,7 @@
 import cv2 as cv
 import numpy as np
-import matplotlib.pyplot as plt
 from corner_pts_reoder import reorder
 
-def contour_perimeter(cnt):
-    return cv.arcLength(cnt, closed=True)
-
-
 def find_corners(preprocessed_img):
     """
     The input should be a processed binary 8 bit image.
@@ -17,10 +12,15 @@ def find_corners(preprocessed_img):
     cnts, _ = cv.findContours(
         preprocessed_img, cv.RETR_EXTERNAL, cv.CHAIN_APPROX_SIMPLE
     )
-    ref_obj_cnt = sorted(cnts, key=contour_perimeter, reverse=True)[:1][0]
+    # the A4 paper is the contour with the largest perimeter
+    perimeters = np.fromiter(
+        (cv.arcLength(cnt, closed=True) for cnt in cnts), dtype=np.float64, count=len(cnts)
+    )
+    ref_obj_idx = int(perimeters.argmax())
+    ref_obj_cnt = cnts[ref_obj_idx]
     # output will be of shape (4, 1, 2).
     corners = cv.convexHull(
-        cv.approxPolyDP(ref_obj_cnt, 0.01 * contour_perimeter(ref_obj_cnt), closed=True)
+        cv.approxPolyDP(ref_obj_cnt, 0.01 * perimeters[ref_obj_idx], closed=True)
     )
     if corners.shape[0] != 4:
         print("Couldn't detect reference object (A4 Paper).\n")
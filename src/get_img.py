@@ -1,6 +1,8 @@
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 import cv2 as cv
 import numpy as np
-import matplotlib.pyplot as plt
 from imutils import rotate_bound
 
 def greetings():
@@ -26,37 +28,72 @@ def read_image(img_path):
     except:
         print("Invalid Image Path")
 
+def _grab_loop(cap, frame_ref, stop_event):
+    """
+    Keep grabbing frames from cap and publish the latest one in frame_ref[0]
+    (None once the device stops delivering frames) until stop_event is set.
+    """
+    while not stop_event.is_set():
+        if not cap.grab():
+            frame_ref[0] = None
+            break
+        ret, frame = cap.retrieve()
+        frame_ref[0] = frame if ret else None
+        if not ret:
+            break
+
 def take_picture(device_id=0):
     cap = cv.VideoCapture(device_id)
 
+    if not cap.isOpened():
+        print("Could not open device. Maybe try with another device. Exiting...\n")
+        return None
+
     cap.set(cv.CAP_PROP_FRAME_HEIGHT, 720)
     cap.set(cv.CAP_PROP_FRAME_WIDTH, 700)
 
-    try:
-        if cap.isOpened() is False:
-            cap.open()
-    except:
-        print("Maybe try with another device. Exiting...\n")
+    # frames are grabbed on a separate thread so that the display loop below
+    # never waits on the device and always shows the latest frame
+    frame_ref = [None]
+    stop_event = threading.Event()
+    grabber = threading.Thread(target=_grab_loop, args=(cap, frame_ref, stop_event), daemon=True)
+
+    ret, frame = cap.read()
+    if ret is False:
+        print("Could not read any frame. Exiting.... \n")
+        cap.release()
         return None
 
+    frame_ref[0] = frame
+    display_frame = np.empty_like(frame)
+    grabber.start()
+
     while True:
-        ret, frame = cap.read()
+        frame = frame_ref[0]
 
-        if ret is False:
+        if frame is None:
             print("Could not read any frame. Exiting.... \n")
+            captured_image = None
             break
 
-        cv.imshow("To capture an image, press 'c' and to quit, press 'q'", frame)
+        # copy into a preallocated buffer so the grabber can keep going
+        if frame.shape != display_frame.shape:
+            display_frame = np.empty_like(frame)
+        np.copyto(display_frame, frame)
+
+        cv.imshow("To capture an image, press 'c' and to quit, press 'q'", display_frame)
 
         key_pressed = cv.waitKey(1) 
         if key_pressed == ord("c"):
-            captured_image = frame
+            captured_image = display_frame.copy()
             break
         if key_pressed == ord("q"):
             captured_image = None
             print("No image was captured. Quitting..... \n")
             break
 
+    stop_event.set()
+    grabber.join()
     cap.release()
     cv.destroyAllWindows()
 
@@ -92,17 +129,16 @@ def usr_prompt():
         )
 
         if video_capture_device_id == "":
-            video_capture_device_id = 0
+            return 0
 
-        try:
-            video_capture_device_id = int(video_capture_device_id)
-            return video_capture_device_id
+        if not video_capture_device_id.isdigit():
+            raise ValueError(f"Invalid device id: {video_capture_device_id!r}")
 
-        except:
-            raise
+        return int(video_capture_device_id)
 
-def read_or_capture(prompt_usr=True, img_path=None, device_id=None):
-    greetings()
+def read_or_capture(prompt_usr=True, img_path=None, device_id=None, greet=True):
+    if greet:
+        greetings()
 
     if prompt_usr:
         usr_input = usr_prompt()
@@ -127,7 +163,44 @@ def read_or_capture(prompt_usr=True, img_path=None, device_id=None):
             print("Please capture another image or provide a valid image path. \n")
             return None
 
+    return orient_portrait(img)
+
+def orient_portrait(img):
+    """
+    Rotate a landscape image by 90 degrees so that every image is processed in portrait orientation.
+
+    Returns: The portrait image (img itself if it already is one)
+    """
     if img.shape[0] < img.shape[1]:
         img = rotate_bound(img, -90)
 
     return img
+
+class Prefetcher:
+    """
+    Iterate over image paths while the next images are already being read (decoded and rotated like
+    read_or_capture() does) on background threads, so reading overlaps with processing the current one.
+
+    Yields: (img_path, future), future.result() is the image or raises the error from reading it.
+    """
+
+    def __init__(self, img_paths, depth=2):
+        self.img_paths = list(img_paths)
+        self.depth = depth
+
+    def __iter__(self):
+        paths = iter(self.img_paths)
+        with ThreadPoolExecutor(max_workers=self.depth) as executor:
+            pending = deque()
+            for img_path in paths:
+                pending.append((img_path, executor.submit(read_or_capture, False, img_path, greet=False)))
+                if len(pending) == self.depth:
+                    break
+
+            while pending:
+                img_path, future = pending.popleft()
+                # keep depth reads in flight while the caller works on this image
+                next_path = next(paths, None)
+                if next_path is not None:
+                    pending.append((next_path, executor.submit(read_or_capture, False, next_path, greet=False)))
+                yield img_path, future
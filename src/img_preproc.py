@@ -1,19 +1,77 @@
+from functools import lru_cache
+
 import cv2 as cv
 import numpy as np
-import matplotlib.pyplot as plt
 
-def preprocess(img):
-    grayscale_img = cv.cvtColor(img, cv.COLOR_BGR2GRAY)
-    grayscale_img_blurred = cv.GaussianBlur(grayscale_img, (5, 5), 0, 0)
+# 2 erosions with a 3x3 square kernel are the same as 1 erosion with a 5x5 square kernel
+_K55 = np.ones((5, 5), dtype=np.uint8)
+# the same erosion for a half resolution image
+_K33 = np.ones((3, 3), dtype=np.uint8)
+# 5x5 gaussian (sigma derived from the size, as with GaussianBlur(..., (5, 5), 0)) as a separable kernel
+_GK = cv.getGaussianKernel(5, 0)
+
+def preprocess(img, half_res=False):
+    """
+    Grayscale, blur, threshold and erode the image into a binary mask.
+
+    Args:
+        img: BGR input image
+        half_res: img is a half resolution decode, erode half as far so the mask matches the full resolution one
+    """
+    # every step writes into the same single channel buffer
+    preprocessed_img = np.empty(img.shape[:2], dtype=np.uint8)
+
+    cv.cvtColor(img, cv.COLOR_BGR2GRAY, dst=preprocessed_img)
+    cv.sepFilter2D(preprocessed_img, -1, _GK, _GK, dst=preprocessed_img)
 
-    _, thresholded_img = cv.threshold(grayscale_img_blurred, 130, 255, cv.THRESH_BINARY)
+    cv.threshold(preprocessed_img, 130, 255, cv.THRESH_BINARY, dst=preprocessed_img)
 
-    morph_operation_kernel = np.ones(
-        (3, 3), dtype=np.uint8
-    ) 
-    thresholded_img_eroded = cv.erode(
-        thresholded_img, morph_operation_kernel, iterations=2
-    )
+    cv.erode(preprocessed_img, _K33 if half_res else _K55, dst=preprocessed_img, iterations=1)
 
-    preprocessed_img = thresholded_img_eroded
     return preprocessed_img
+
+@lru_cache(maxsize=None)
+def cuda_available():
+    # opencv builds without CUDA report 0 devices
+    try:
+        return cv.cuda.getCudaEnabledDeviceCount() > 0
+    except (AttributeError, cv.error):
+        return False
+
+@lru_cache(maxsize=None)
+def _gpu_filters(half_res=False):
+    # the filter objects are created once and reused for every image
+    gaussian = cv.cuda.createGaussianFilter(cv.CV_8UC1, cv.CV_8UC1, (5, 5), 0)
+    erode = cv.cuda.createMorphologyFilter(cv.MORPH_ERODE, cv.CV_8UC1, _K33 if half_res else _K55)
+    return gaussian, erode
+
+def preprocess_gpu(img, undistort_maps=None, half_res=False):
+    """
+    Same chain as preprocess(), optionally preceded by undistortion, run on the GPU.
+    The image is uploaded once and stays on the device between the steps.
+
+    Args:
+        img: BGR input image
+        undistort_maps: (map1_gpu, map2_gpu, roi) as returned by camera_calibration.undistort_maps_gpu(), or None
+        half_res: as for preprocess()
+
+    Returns: (the possibly undistorted image, the preprocessed binary image)
+    """
+    gaussian, erode = _gpu_filters(half_res)
+
+    g = cv.cuda_GpuMat()
+    g.upload(img)
+
+    if undistort_maps is not None:
+        map1, map2, roi = undistort_maps
+        g = cv.cuda.remap(g, map1, map2, cv.INTER_LINEAR)
+        if all(roi):
+            g = cv.cuda_GpuMat(g, roi)
+        img = g.download()
+
+    g = cv.cuda.cvtColor(g, cv.COLOR_BGR2GRAY)
+    g = gaussian.apply(g)
+    _, g = cv.cuda.threshold(g, 130, 255, cv.THRESH_BINARY)
+    g = erode.apply(g)
+
+    return img, g.download()
@@ -1,6 +1,4 @@
 import cv2 as cv
-import numpy as np
-import matplotlib.pyplot as plt
 
 def matplotlib_imshow(
     img_title="", img=None, scale=5, cv_colorspace_conversion_flag=cv.COLOR_BGR2RGB
@@ -11,6 +9,8 @@ def matplotlib_imshow(
     scale = 5: the default scaling is 5
     cv_colorspace_conversion_flag = cv.COLOR_BGR2RGB: colorspace conversion
     """
+    # imported here so that importing the pipeline doesn't pay for loading matplotlib
+    import matplotlib.pyplot as plt
 
     try:
         img_height, img_width = img.shape[0], img.shape[1]
@@ -0,0 +1,412 @@
+from matplotlib_imshow import matplotlib_imshow
+from get_img import read_or_capture, orient_portrait, greetings, Prefetcher
+from img_preproc import preprocess, preprocess_gpu, cuda_available
+from find_ref_object import find_corners
+from trans_prespec import perspective_transform
+from find_object import find_object_of_interest
+from viz_detec import visualize_detections
+from error_calc import read_actual_dimensions, calculate_error_metrics, add_error_metrics_to_image 
+import os
+import queue
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+import cv2
+import numpy as np
+from ref_object import calculate_pixels_per_metric, measure_object, draw_reference_and_measurements, detect_reference_object_debug, dissimilar_area_mask
+from camera_calibration import load_calibration, undistort_image, undistort_maps_gpu
+
+def load_camera_calibration(use_calibration=False, calibration_file=None):
+    """
+    Load the camera calibration to use for the pipeline.
+
+    Returns: (camera_matrix, dist_coeffs), or None if no calibration is used or it couldn't be loaded
+    """
+    if use_calibration and calibration_file:
+        try:
+            return load_calibration(calibration_file)
+        except Exception as e:
+            print(f"Error applying calibration: {e}")
+    return None
+
+def load_and_preprocess(img, camera_calibration=None, half_res=False):
+    """
+    Stage 1 of the pipeline: undistort the image (if a calibration is given) and preprocess it.
+
+    Args:
+        img: the input image
+        camera_calibration: (camera_matrix, dist_coeffs) as returned by load_camera_calibration(), or None
+        half_res: img is a half resolution decode (see preprocess())
+
+    Returns: (the possibly undistorted image, the preprocessed binary image)
+    """
+    if cuda_available():
+        # undistortion and preprocessing stay on the GPU, falls back to the CPU path on failure
+        try:
+            undistort_maps = None
+            if camera_calibration is not None:
+                h, w = img.shape[:2]
+                undistort_maps = undistort_maps_gpu(*camera_calibration, (w, h))
+            return preprocess_gpu(img, undistort_maps, half_res)
+        except cv2.error as e:
+            print(f"GPU preprocessing failed, using the CPU: {e}")
+
+    if camera_calibration is not None:
+        try:
+            # the undistortion maps are computed once per calibration and image size and then reused
+            img = undistort_image(img, *camera_calibration)
+            print("Applied camera calibration for distortion correction")
+        except Exception as e:
+            print(f"Error applying calibration: {e}")
+
+    preprocessed_img = preprocess(img, half_res)
+    return img, preprocessed_img
+
+def a4_geometry(img, preprocessed_img):
+    """
+    Stage 2 of the A4 paper pipeline: find the A4 paper and get a top-down view of it.
+
+    Returns: the perspective transformed image
+    """
+    corners = find_corners(preprocessed_img)
+    perspective_transformed_img = perspective_transform(img, corners)
+    return perspective_transformed_img
+
+def a4_detect_and_measure(perspective_transformed_img, image_path=None):
+    """
+    Stage 3 of the A4 paper pipeline: find the object of interest on the A4 paper, measure it
+    and compare the measurement with the actual dimensions (if image_path has a .txt file).
+    The detections are drawn on perspective_transformed_img itself.
+
+    Returns: the output image with the detections and measurements drawn
+    """
+    convex_hull = find_object_of_interest(perspective_transformed_img)
+
+    # Get the calculated dimensions from visualize_detections
+    output_img_to_show, calculated_dimensions = visualize_detections(
+        perspective_transformed_img, convex_hull, return_dimensions=True, inplace=True)
+    
+    # Check if there's a corresponding text file with actual dimensions
+    actual_dims = read_actual_dimensions(image_path) if image_path else None
+    
+    if actual_dims and calculated_dimensions:
+        # Calculate error metrics
+        error_metrics = calculate_error_metrics(calculated_dimensions, actual_dims)
+        print(f"Actual dimensions: {actual_dims[0]:.1f} x {actual_dims[1]:.1f} cm")
+        print(f"Measured dimensions: {calculated_dimensions[0]:.1f} x {calculated_dimensions[1]:.1f} cm")
+        print("Measurement errors:")
+        print(f"  Absolute: Width = {error_metrics['abs_error_width']:.2f} cm, Height = {error_metrics['abs_error_height']:.2f} cm")
+        print(f"  Relative: Width = {error_metrics['rel_error_width']:.1f}%, Height = {error_metrics['rel_error_height']:.1f}%")
+        
+        # Add error metrics to the image
+        output_img_to_show = add_error_metrics_to_image(
+            output_img_to_show, calculated_dimensions, error_metrics)
+
+    return output_img_to_show
+
+def _run_a4(img, preprocessed_img, image_path=None, **_):
+    """
+    The A4 paper method: measure the object lying on an A4 paper.
+
+    Returns: the output image with the detections and measurements drawn
+    """
+    perspective_transformed_img = a4_geometry(img, preprocessed_img)
+    return a4_detect_and_measure(perspective_transformed_img, image_path)
+
+def _run_reference(img, preprocessed_img, image_path=None, reference_object_dimensions=None, debug=False, lowres=False):
+    """
+    The reference object method: measure the largest object that isn't the reference object,
+    using the reference object (of reference_object_dimensions in cm) for the scale.
+
+    Returns: the output image with the reference and the measured object drawn
+    """
+    # Try to detect reference object with more lenient parameters
+    # the detector's Otsu threshold and its contours are reused below
+    reference_contour, contours, thresh = detect_reference_object_debug(
+        preprocessed_img, 
+        min_area=50,  # Even more lenient minimum area
+        max_area=preprocessed_img.shape[0] * preprocessed_img.shape[1] * 0.9,  # 90% of image
+        save_debug=True,
+        image_filename=image_path,  # Pass the image filename
+        methods="all"  # the largest contour of any method, Otsu alone misses the card on some images
+    )
+
+    if reference_contour is None:
+        print("Error: Could not detect reference object")
+        return img
+
+    if lowres:
+        # back to full resolution coordinates, so pixels_per_unit is for the full resolution image
+        reference_contour = reference_contour * 2
+
+    # Calculate pixels per metric
+    pixels_per_unit, ref_px_dims, ref_dims, ref_rect = calculate_pixels_per_metric(
+        reference_contour, reference_object_dimensions)
+
+    print(f"Reference object: {ref_px_dims[0]:.1f} x {ref_px_dims[1]:.1f} pixels")
+    print(f"Reference dimensions: {ref_dims[0]} x {ref_dims[1]} cm")
+    print(f"Pixels per unit: {pixels_per_unit:.2f} pixels/cm")
+
+    # Find the largest non-reference object (object of interest)
+    if debug:
+        # Areas of all contours, computed once
+        areas = np.fromiter((cv2.contourArea(cnt) for cnt in contours), dtype=np.float32, count=len(contours))
+    else:
+        # Fill the holes of every blob first, so that its pixel count is the enclosed area that
+        # contourArea gives for the reference (a ring would otherwise count only its own pixels)
+        outside = cv2.copyMakeBorder(thresh, 1, 1, 1, 1, cv2.BORDER_CONSTANT, value=0)
+        cv2.floodFill(outside, None, (0, 0), 255)
+        filled = cv2.bitwise_or(thresh, cv2.bitwise_not(outside[1:-1, 1:-1]))
+        del outside
+        # Areas of all blobs straight from a single labelling pass (label 0 is the background)
+        _, labels, stats, _ = cv2.connectedComponentsWithStats(filled, connectivity=8, ltype=cv2.CV_32S)
+        areas = stats[1:, cv2.CC_STAT_AREA].astype(np.float32)
+    if lowres:
+        # the blobs come from the half resolution image, the reference contour is already scaled up
+        areas *= 4
+    ref_area = cv2.contourArea(reference_contour)
+
+    # Skip contours that are too similar to reference object
+    keep = dissimilar_area_mask(areas, ref_area, tolerance=0.2)  # If area differs by more than 20%
+
+    kept = np.flatnonzero(keep)
+
+    if not kept.size:
+        print("Error: Could not detect any objects besides the reference")
+        # Draw just the reference for debugging
+        output_img = img.copy()
+        cv2.drawContours(output_img, [reference_contour], 0, (0, 255, 0), 2)
+        return output_img
+
+    # Only the largest remaining one is measured
+    object_idx = kept[int(np.argmax(areas[kept]))]
+    if debug:
+        object_contour = contours[object_idx]
+    else:
+        # Trace the contour of the chosen blob only
+        object_mask = np.uint8(labels == object_idx + 1) * 255
+        object_contour = cv2.findContours(object_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)[0][0]
+    if lowres:
+        object_contour = object_contour * 2
+    # the label image alone is 4 bytes per pixel, none of this is needed for measuring and drawing
+    del contours, thresh, areas, keep, kept
+    if not debug:
+        del filled, labels, stats, object_mask
+
+    # Measure the object
+    width, height, rect = measure_object(object_contour, pixels_per_unit)
+
+    # Visualize the results
+    return draw_reference_and_measurements(
+        img, reference_contour, object_contour, 
+        reference_object_dimensions, (width, height), rect, ref_rect, inplace=True
+    )
+
+# every method is called as method(img, preprocessed_img, image_path, **options)
+METHODS = {"a4": _run_a4, "reference": _run_reference}
+
+def pipeline_for_still_images(
+    prompt_user=False,
+    image_path="../input_images/jar.jpg",
+    capturing_device_id=None,
+    visualize=True,
+    scale=8,
+    use_calibration=False,
+    calibration_file=None,
+    reference_object_dimensions=None,  # e.g., (width, height) in cm
+    use_reference_object=False,
+    debug=False,
+    lowres=False,
+    method=None
+):
+    """
+    A pipeline for detecting objects of interest from a still image and find the objects dimensions (width, height) in cm.
+
+    Args:
+        prompt_user: whether to prompt the user for image path or, device id. (default: False)
+        image_path: to use a stock/pre-captured image instead of prompting the user. (default: "./sample_imgs/paint_brush.jpeg")
+        capturing_device_id: to capture a live image instead of prompting or loading a stock one. (default: None)
+        visualize: whether to show the output image containing the info of detections. (default: True)
+        scale: matplotlib_imshow() function visualization scale. (default: 8)
+        use_calibration: Whether to use camera calibration for measurements (default: False)
+        calibration_file: Path to camera calibration file (default: None)
+        reference_object_dimensions: Dimensions of reference object in the scene (width, height) in cm
+        use_reference_object: Use general reference object method instead of A4 paper (when method is None)
+        debug: Enumerate the blobs of the reference object method with findContours instead of connected components (default: False)
+        lowres: Search the reference object and the object of interest on a half resolution decode of image_path,
+            the results are drawn on the full resolution image (default: False)
+        method: one of METHODS ("a4", "reference"). By default "reference" if use_reference_object is set
+            and reference_object_dimensions are given, otherwise "a4". (default: None)
+
+    Returns: The output image (A rotated bounding box is drawn around the object of interest. The calculated dimensions (width, height) are also shown on the output image.)
+
+    """
+
+    if method is None:
+        method = "reference" if use_reference_object and reference_object_dimensions else "a4"
+    if method not in METHODS:
+        raise ValueError(f"Unknown method {method!r}, expected one of {sorted(METHODS)}")
+    if method == "reference" and not reference_object_dimensions:
+        raise ValueError("The reference method needs reference_object_dimensions")
+
+    # the half resolution pass needs an image file to decode
+    lowres = (lowres and method == "reference"
+              and not prompt_user and capturing_device_id is None and image_path is not None)
+
+    img = read_or_capture(prompt_user, image_path, capturing_device_id)
+    camera_calibration = load_camera_calibration(use_calibration, calibration_file)
+    if lowres:
+        # the jpeg decoder downscales while decoding, the full resolution image is only drawn on
+        small_img = orient_portrait(cv2.imread(image_path, cv2.IMREAD_REDUCED_COLOR_2))
+        small_calibration = None
+        if camera_calibration is not None:
+            # like load_and_preprocess(), a calibration that can't be applied is skipped
+            # (for both images, so that they stay aligned)
+            try:
+                camera_matrix, dist_coeffs = camera_calibration
+                small_camera_matrix = camera_matrix.copy()
+                small_camera_matrix[:2] *= 0.5
+                img = undistort_image(img, camera_matrix, dist_coeffs)
+                small_calibration = (small_camera_matrix, dist_coeffs)
+            except Exception as e:
+                print(f"Error applying calibration: {e}")
+        _, preprocessed_img = load_and_preprocess(small_img, small_calibration, half_res=True)
+        del small_img
+    else:
+        img, preprocessed_img = load_and_preprocess(img, camera_calibration)
+    
+    output_img_to_show = METHODS[method](
+        img, preprocessed_img, image_path,
+        reference_object_dimensions=reference_object_dimensions, debug=debug, lowres=lowres
+    )
+    # only the output image is kept around while it's shown
+    del img, preprocessed_img
+
+    if visualize is True:
+        matplotlib_imshow(
+            "Detected Object and its Calculated measurements \n(Width and Height) in cm",
+            output_img_to_show,
+            scale,
+        )
+    
+    return output_img_to_show
+
+def pipeline_for_still_images_batch(
+    image_paths,
+    use_calibration=False,
+    calibration_file=None,
+    visualize=False,
+    scale=8,
+):
+    """
+    Run the A4 paper pipeline over several images. The images are read ahead by a Prefetcher and
+    the three stages (undistort + preprocess, A4 paper detection + perspective transform, object
+    detection + measurement) run on their own threads connected by small queues, so consecutive
+    images overlap across the stages (OpenCV releases the GIL while it works).
+
+    Args:
+        image_paths: paths of the images to measure
+        use_calibration: Whether to use camera calibration for measurements (default: False)
+        calibration_file: Path to camera calibration file (default: None)
+        visualize: whether to show each output image. (default: False)
+        scale: matplotlib_imshow() function visualization scale. (default: 8)
+
+    Returns: A list with the output image for every path (in the same order), None where processing failed.
+    """
+    image_paths = list(image_paths)
+    greetings()
+
+    # the calibration is loaded once for the whole batch
+    camera_calibration = load_camera_calibration(use_calibration, calibration_file)
+
+    # every stage is called as stage(output of the previous stage, image_path)
+    def stage1(img, _):
+        return load_and_preprocess(img, camera_calibration)
+
+    def stage2(images, _):
+        return a4_geometry(*images)
+
+    stages = [stage1, stage2, a4_detect_and_measure]
+    queues = [queue.Queue(maxsize=2) for _ in stages]
+    results = queue.Queue()
+
+    def run_stage(stage, in_queue, out_queue):
+        while True:
+            item = in_queue.get()
+            if item is None:
+                out_queue.put(None)
+                return
+            idx, image_path, data = item
+            # failures are passed down the pipeline instead of stopping it
+            if not isinstance(data, Exception):
+                try:
+                    data = stage(data, image_path)
+                except Exception as e:
+                    data = e
+            out_queue.put((idx, image_path, data))
+
+    with ThreadPoolExecutor(max_workers=len(stages)) as executor:
+        for stage, in_queue, out_queue in zip(stages, queues, queues[1:] + [results]):
+            executor.submit(run_stage, stage, in_queue, out_queue)
+
+        # the images are read ahead on their own threads
+        for idx, (image_path, future) in enumerate(Prefetcher(image_paths)):
+            try:
+                img = future.result()
+            except Exception as e:
+                img = e
+            queues[0].put((idx, image_path, img))
+        queues[0].put(None)
+
+        output_imgs = [None] * len(image_paths)
+        while True:
+            item = results.get()
+            if item is None:
+                break
+            idx, image_path, output_img_to_show = item
+            if isinstance(output_img_to_show, Exception):
+                print(f"Error processing {image_path}: {output_img_to_show}")
+                continue
+            output_imgs[idx] = output_img_to_show
+
+    if visualize is True:
+        for image_path, output_img_to_show in zip(image_paths, output_imgs):
+            if output_img_to_show is not None:
+                matplotlib_imshow(
+                    f"Detected Object and its Calculated measurements \n(Width and Height) in cm\n{image_path}",
+                    output_img_to_show,
+                    scale,
+                )
+
+    return output_imgs
+
+def _init_batch_worker():
+    # one image per process, so OpenCV itself runs single threaded instead of contending for the cores
+    cv2.setNumThreads(1)
+
+def run_batch(image_paths, max_workers=None, **pipeline_kwargs):
+    """
+    Run pipeline_for_still_images() over several images, one image per worker process.
+
+    Args:
+        image_paths: paths of the images to measure
+        max_workers: number of worker processes (default: os.cpu_count())
+        pipeline_kwargs: further keyword arguments for pipeline_for_still_images()
+
+    Returns: A list with the output image for every path (in the same order), None where processing failed.
+    """
+    image_paths = list(image_paths)
+    pipeline_kwargs.setdefault("visualize", False)
+
+    with ProcessPoolExecutor(max_workers=max_workers or os.cpu_count(),
+                             initializer=_init_batch_worker) as executor:
+        futures = [executor.submit(pipeline_for_still_images, image_path=image_path, **pipeline_kwargs)
+                   for image_path in image_paths]
+
+        output_imgs = []
+        for image_path, future in zip(image_paths, futures):
+            try:
+                output_imgs.append(future.result())
+            except Exception as e:
+                print(f"Error processing {image_path}: {e}")
+                output_imgs.append(None)
+
+    return output_imgs
@@ -1,8 +1,69 @@
+import os
+import threading
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
 import cv2
 import numpy as np
-import math
 
-def detect_reference_object(image, reference_contours=None, min_area=1000, max_area=None):
+# Per thread grayscale and blur buffers of _gray_and_blurred()
+_BUFFERS = threading.local()
+
+# Debug images of detect_reference_object_debug go here (relative to the working directory)
+_DEBUG_DIR = "debug_images"
+
+# Debug images don't need to be exact
+_DEBUG_JPEG_PARAMS = [int(cv2.IMWRITE_JPEG_QUALITY), 85, int(cv2.IMWRITE_JPEG_OPTIMIZE), 1]
+
+# Thresholding methods of detect_reference_object_debug: name -> (blurred gray -> binary image, debug image suffix)
+THRESHOLD_METHODS = {
+    "otsu": (lambda blurred: cv2.threshold(blurred, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)[1], "thresh_otsu"),
+    "adaptive": (lambda blurred: cv2.adaptiveThreshold(blurred, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
+                                                       cv2.THRESH_BINARY, 11, 2), "thresh_adaptive"),
+    "canny": (lambda blurred: cv2.Canny(blurred, 30, 150), "edges"),
+    "canny_sensitive": (lambda blurred: cv2.Canny(blurred, 10, 100), "edges2"),
+    # inverted for white objects
+    "inverted": (lambda blurred: cv2.threshold(cv2.bitwise_not(blurred), 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)[1], "inverted"),
+}
+
+@lru_cache(maxsize=None)
+def _gaussian_kernel(ksize):
+    """Separable gaussian kernel of size ksize (sigma derived from the size), built once per size."""
+    return cv2.getGaussianKernel(ksize, 0)
+
+def _gray_and_blurred(image, blur_ksize=5, use_blur=True):
+    """
+    Grayscale version of the image (unless it already is) and its blur_ksize x blur_ksize gaussian blur
+    (or the grayscale image itself if use_blur is False). Both are written into buffers that are reused by the next call on the same thread for the same image size.
+    """
+    key = (image.shape[:2], image.dtype)
+    buffers = getattr(_BUFFERS, "buffers", None)
+    if buffers is None or buffers[0] != key:
+        # only the latest size is kept, consecutive frames of a video or batch share it
+        buffers = _BUFFERS.buffers = (key, np.empty(key[0], key[1]), np.empty(key[0], key[1]))
+    _, gray_buf, blurred_buf = buffers
+    
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY, dst=gray_buf) if len(image.shape) == 3 else image
+    if not use_blur:
+        # clean, high contrast images threshold just as well without it
+        return gray, gray
+    kernel = _gaussian_kernel(blur_ksize)
+    return gray, cv2.sepFilter2D(gray, -1, kernel, kernel, dst=blurred_buf)
+
+def _contour_areas(contours):
+    """Areas of all contours as a float64 array."""
+    return np.fromiter((cv2.contourArea(cnt) for cnt in contours), dtype=np.float64, count=len(contours))
+
+def _largest_valid(areas, min_area, max_area):
+    """
+    Returns: (mask of the areas strictly between min_area and max_area, index of the largest of them or None)
+    """
+    valid = (areas > min_area) & (areas < max_area)
+    if not valid.any():
+        return valid, None
+    return valid, int(np.argmax(np.where(valid, areas, -1)))
+
+def detect_reference_object(image, reference_contours=None, min_area=1000, max_area=None, downscale=2,
+                            blur_ksize=5, use_blur=True):
     """
     Detect a reference object in the image.
     
@@ -11,6 +72,10 @@ def detect_reference_object(image, reference_contours=None, min_area=1000, max_a
         reference_contours: Pre-detected contours to search within (optional)
         min_area: Minimum area for the reference object
         max_area: Maximum area for the reference object (if None, uses 1/4 of image area)
+        downscale: Factor to shrink the image by before searching for contours, the returned
+            contour is in full resolution coordinates (only used without reference_contours)
+        blur_ksize: Size of the gaussian blur before thresholding
+        use_blur: Whether to blur before thresholding at all
         
     Returns:
         contour: Contour of the reference object
@@ -19,16 +84,16 @@ def detect_reference_object(image, reference_contours=None, min_area=1000, max_a
         max_area = image.shape[0] * image.shape[1] // 4  # 1/4 of image area
     
     # If no contours provided, find them
+    scale = 1
     if reference_contours is None:
-        # Convert to grayscale if needed
-        if len(image.shape) == 3:
-            gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-        else:
-            gray = image
-            
+        if downscale > 1:
+            # the reference object is large, it's found just as well at a lower resolution
+            image = cv2.resize(image, None, fx=1 / downscale, fy=1 / downscale, interpolation=cv2.INTER_AREA)
+            scale = downscale
+        
         # Threshold the image
-        blurred = cv2.GaussianBlur(gray, (5, 5), 0)
-        _, thresh = cv2.threshold(blurred, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+        _, blurred = _gray_and_blurred(image, blur_ksize, use_blur)
+        thresh = THRESHOLD_METHODS["otsu"][0](blurred)
         
         # Find contours
         contours, _ = cv2.findContours(thresh, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
@@ -36,113 +101,160 @@ def detect_reference_object(image, reference_contours=None, min_area=1000, max_a
         contours = reference_contours
     
     # Find the reference object (assuming it's one of the largest objects with reasonable size)
-    valid_contours = [cnt for cnt in contours if min_area < cv2.contourArea(cnt) < max_area]
-    
-    # Sort by area (largest first)
-    valid_contours.sort(key=cv2.contourArea, reverse=True)
-    
-    if not valid_contours:
+    # single pass, only the largest valid contour is kept
+    area_scale = scale * scale
+    best_cnt, best_area = None, 0.0
+    for cnt in contours:
+        area = cv2.contourArea(cnt) * area_scale
+        if min_area < area < max_area and area > best_area:
+            best_cnt, best_area = cnt, area
+    
+    if best_cnt is None:
         return None
         
-    return valid_contours[0]  # Return the largest valid contour\
+    return best_cnt * scale  # Return the largest valid contour
 
-def detect_reference_object_debug(image, reference_contours=None, min_area=100, max_area=None, save_debug=True, image_filename="image"):
-    """Enhanced version with debugging"""
-    # Create a debug image
-    debug_img = image.copy() if len(image.shape) == 3 else cv2.cvtColor(image, cv2.COLOR_GRAY2BGR)
-    
-    # Extract base filename without path or extension
-    import os
-    base_filename = os.path.splitext(os.path.basename(image_filename))[0]
-    debug_dir = "debug_images"
-    os.makedirs(debug_dir, exist_ok=True)
+def _debug_prefix(image_filename):
+    """Path prefix of the debug images of an image: the debug directory plus the file name without extension."""
+    os.makedirs(_DEBUG_DIR, exist_ok=True)
+    return os.path.join(_DEBUG_DIR, os.path.splitext(os.path.basename(image_filename))[0])
+
+def _write_debug(path, img):
+    """Encode a debug image to jpeg and write it with one buffered write."""
+    ok, buf = cv2.imencode(".jpg", img, _DEBUG_JPEG_PARAMS)
+    if ok:
+        with open(path, "wb", buffering=1 << 20) as f:
+            f.write(buf)
+
+@lru_cache(maxsize=None)
+def _io_pool():
+    """Thread pool for encoding and writing debug images (OpenCV releases the GIL while encoding), created on first use."""
+    return ThreadPoolExecutor(max_workers=4)
+
+def _save_debug(debug_writes, path, img):
+    """Encode and write a debug image on the IO pool, img must not change until _flush_debug()."""
+    debug_writes.append(_io_pool().submit(_write_debug, path, img))
+
+def _flush_debug(debug_writes):
+    """Wait for the queued debug images to be written."""
+    for future in debug_writes:
+        future.result()
+    debug_writes.clear()
+
+def detect_reference_object_debug(image, reference_contours=None, min_area=100, max_area=None, save_debug=True, image_filename="image", methods=("otsu",),
+                                  blur_ksize=5, use_blur=True):
+    """
+    Enhanced version with debugging
+
+    Args:
+        methods: name or names from THRESHOLD_METHODS, tried in order until one of them yields a contour of
+            valid area. "all" runs every method and picks the largest valid contour among all of them.
+        blur_ksize: Size of the gaussian blur before thresholding
+        use_blur: Whether to blur before thresholding at all
+
+    Returns:
+        (reference contour or None, contours of the first method, threshold image of the first method) so that
+        callers can reuse them instead of thresholding again. With reference_contours given these are
+        (reference contour or None, reference_contours, None)
+    """
+    exhaustive = methods == "all"
+    if exhaustive:
+        methods = tuple(THRESHOLD_METHODS)
+    elif isinstance(methods, str):
+        methods = (methods,)
+    unknown = [method for method in methods if method not in THRESHOLD_METHODS]
+    if unknown:
+        raise ValueError(f"Unknown threshold methods {unknown}, expected names from {sorted(THRESHOLD_METHODS)} or \"all\"")
+    
+    debug_prefix = _debug_prefix(image_filename) if save_debug else None
+    # debug images are encoded and written in the background, the writes are waited for before returning
+    debug_writes = []
     
     if max_area is None:
         max_area = image.shape[0] * image.shape[1] // 2  # Half of image area
     
     # If no contours provided, find them
     if reference_contours is None:
-        # Convert to grayscale if needed
-        if len(image.shape) == 3:
-            gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-        else:
-            gray = image
-            
-        # Use adaptive thresholding instead of global
-        blurred = cv2.GaussianBlur(gray, (5, 5), 0)
-        
-        # Try multiple thresholding methods
-        # 1. Otsu's method
-        _, thresh1 = cv2.threshold(blurred, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
-        
-        # 2. Adaptive thresholding
-        thresh2 = cv2.adaptiveThreshold(blurred, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
-                                     cv2.THRESH_BINARY, 11, 2)
-        
-        # 3. Canny edge detection
-        edges = cv2.Canny(blurred, 30, 150)
+        gray, blurred = _gray_and_blurred(image, blur_ksize, use_blur)
         
         # Save debug images
         if save_debug:
-            cv2.imwrite(f"{debug_dir}/{base_filename}_grayscale.jpg", gray)
-            cv2.imwrite(f"{debug_dir}/{base_filename}_thresh_otsu.jpg", thresh1)
-            cv2.imwrite(f"{debug_dir}/{base_filename}_thresh_adaptive.jpg", thresh2)
-            cv2.imwrite(f"{debug_dir}/{base_filename}_edges.jpg", edges)
-        
-        # Find contours using different methods
-        contours1, _ = cv2.findContours(thresh1, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-        contours2, _ = cv2.findContours(thresh2, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-        contours3, _ = cv2.findContours(edges, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+            _save_debug(debug_writes, f"{debug_prefix}_grayscale.jpg", gray)
         
-        edges2 = cv2.Canny(blurred, 10, 100)  # More sensitive
-        contours4, _ = cv2.findContours(edges2, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-
-        # Try inverting the image for white objects
-        inverted = cv2.bitwise_not(blurred)
-        _, thresh_inv = cv2.threshold(inverted, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
-        contours5, _ = cv2.findContours(thresh_inv, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-
-        if save_debug:
-            cv2.imwrite(f"{debug_dir}/{base_filename}_edges2.jpg", edges2)
-            cv2.imwrite(f"{debug_dir}/{base_filename}_inverted.jpg", thresh_inv)
-
-        # Combine all contours
-        contours = contours1 + contours2 + contours3 + contours4 + contours5
+        # Try the thresholding methods in order
+        contours, areas = [], []
+        contours1 = thresh1 = None
+        for method in methods:
+            threshold, debug_suffix = THRESHOLD_METHODS[method]
+            thresh = threshold(blurred)
+            if save_debug:
+                _save_debug(debug_writes, f"{debug_prefix}_{debug_suffix}.jpg", thresh)
+            
+            method_contours, _ = cv2.findContours(thresh, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+            if thresh1 is None:
+                contours1, thresh1 = method_contours, thresh
+            
+            # every area is computed once
+            method_areas = _contour_areas(method_contours)
+            contours += method_contours
+            areas.append(method_areas)
+            
+            # the later methods are only fallbacks, unless all of them were asked for
+            if not exhaustive and ((method_areas > min_area) & (method_areas < max_area)).any():
+                break
+        areas = np.concatenate(areas) if areas else np.empty(0)
     else:
-        contours = reference_contours
+        contours = contours1 = reference_contours
+        thresh1 = None
+        areas = _contour_areas(contours)
     
     print(f"Found {len(contours)} contours")
     
     # Filter contours by area
-    valid_contours = []
-    for i, cnt in enumerate(contours):
-        area = cv2.contourArea(cnt)
-        if min_area < area < max_area:
-            valid_contours.append(cnt)
-            # Draw all valid contours on debug image
-            cv2.drawContours(debug_img, [cnt], -1, (0, 255, 0), 2)
-            cv2.putText(debug_img, f"{area:.0f}", 
-                        tuple(cnt[0][0]), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 0, 0), 1)
-    
-    print(f"Found {len(valid_contours)} valid contours (area between {min_area} and {max_area})")
-    if save_debug:
-        cv2.imwrite(f"{debug_dir}/{base_filename}_all_contours.jpg", debug_img)
+    valid, largest_idx = _largest_valid(areas, min_area, max_area)
+    valid_idx = np.flatnonzero(valid)
+    print(f"Found {len(valid_idx)} valid contours (area between {min_area} and {max_area})")
     
-    if not valid_contours:
-        return None
-    
-    # Sort by area (largest first)
-    valid_contours.sort(key=cv2.contourArea, reverse=True)
+    if save_debug:
+        # Create a debug image
+        debug_img = image.copy() if len(image.shape) == 3 else cv2.cvtColor(image, cv2.COLOR_GRAY2BGR)
+        # Draw all valid contours on debug image in one call, only the labels need a loop
+        cv2.drawContours(debug_img, [contours[i] for i in valid_idx], -1, (0, 255, 0), 2)
+        # first point of every valid contour as the label anchor, converted to ints in one go
+        anchors = [contours[i][0, 0] for i in valid_idx]
+        for i, (x, y) in zip(valid_idx, np.array(anchors, dtype=np.int32).reshape(-1, 2).tolist()):
+            cv2.putText(debug_img, f"{areas[i]:.0f}", 
+                        (x, y), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 0, 0), 1)
+        _save_debug(debug_writes, f"{debug_prefix}_all_contours.jpg", debug_img.copy())
+    
+    if largest_idx is None:
+        _flush_debug(debug_writes)
+        return None, contours1, thresh1
     
     # Get the largest contour
-    largest_contour = valid_contours[0]
+    largest_contour = contours[largest_idx]
     
-    # Draw the selected contour in a different color
-    cv2.drawContours(debug_img, [largest_contour], -1, (0, 0, 255), 3)
     if save_debug:
-        cv2.imwrite(f"{debug_dir}/{base_filename}_selected_contour.jpg", debug_img)
+        # Draw the selected contour in a different color
+        cv2.drawContours(debug_img, [largest_contour], -1, (0, 0, 255), 3)
+        _save_debug(debug_writes, f"{debug_prefix}_selected_contour.jpg", debug_img)
     
-    return largest_contour
+    _flush_debug(debug_writes)
+    return largest_contour, contours1, thresh1
+
+def dissimilar_area_mask(areas, ref_area, tolerance=0.2):
+    """
+    Find the contours whose area differs from the reference object's area by more than tolerance.
+    
+    Args:
+        areas: Array of contour areas
+        ref_area: Area of the reference object
+        tolerance: Relative area difference up to which a contour counts as the reference object
+        
+    Returns:
+        mask: Boolean array, True for the contours that are not the reference object
+    """
+    return np.abs(areas - ref_area) / np.maximum(areas, ref_area) > tolerance
 
 def calculate_pixels_per_metric(reference_contour, reference_dimensions):
     """
@@ -154,11 +266,12 @@ def calculate_pixels_per_metric(reference_contour, reference_dimensions):
         
     Returns:
         pixels_per_unit: Conversion factor for measurements
+        (width_px, height_px): Size of the reference object in pixels (longer side first)
+        (ref_width, ref_height): reference_dimensions, longer side first
+        rect: Minimum area rectangle of the reference object
     """
     # Find the minimum area rectangle that encloses the contour
     rect = cv2.minAreaRect(reference_contour)
-    box = cv2.boxPoints(rect)
-    box = np.int0(box)
     
     # Get width and height of the reference object in pixels
     width_px, height_px = rect[1]
@@ -182,7 +295,7 @@ def calculate_pixels_per_metric(reference_contour, reference_dimensions):
     # Use the average for better accuracy
     pixels_per_unit = (pixels_per_unit_width + pixels_per_unit_height) / 2
     
-    return pixels_per_unit, (width_px, height_px), (ref_width, ref_height)
+    return pixels_per_unit, (width_px, height_px), (ref_width, ref_height), rect
 
 def measure_object(object_contour, pixels_per_unit, correction_factor=2.75):
     """
@@ -197,19 +310,19 @@ def measure_object(object_contour, pixels_per_unit, correction_factor=2.75):
     """
     # Find the minimum area rectangle
     rect = cv2.minAreaRect(object_contour)
-    width_px, height_px = rect[1]
     
-    # Convert to real-world units
-    width = width_px / pixels_per_unit / correction_factor
-    height = height_px / pixels_per_unit / correction_factor
+    # Width is always the larger dimension, ordered once in pixels
+    side_a, side_b = rect[1]
+    width_px, height_px = (side_a, side_b) if side_a >= side_b else (side_b, side_a)
     
-    # Ensure width is always the larger dimension
-    if width < height:
-        width, height = height, width
+    # Convert to real-world units (one combined factor for both sides)
+    px_per_measured_unit = pixels_per_unit * correction_factor
+    width = width_px / px_per_measured_unit
+    height = height_px / px_per_measured_unit
     
     return width, height, rect
 
-def draw_reference_and_measurements(image, reference_contour, object_contour, reference_dimensions, object_dimensions, rect=None):
+def draw_reference_and_measurements(image, reference_contour, object_contour, reference_dimensions, object_dimensions, rect=None, ref_rect=None, inplace=False):
     """
     Draw the reference object, measured object, and their dimensions on the image.
     
@@ -220,22 +333,27 @@ def draw_reference_and_measurements(image, reference_contour, object_contour, re
         reference_dimensions: (width, height) of reference in real units
         object_dimensions: (width, height) of object in real units
         rect: Minimum area rectangle of the object (optional)
+        ref_rect: Minimum area rectangle of the reference (optional)
+        inplace: Draw on image itself instead of on a copy
         
     Returns:
         annotated_image: Image with annotations
     """
-    output = image.copy()
+    output = image if inplace else image.copy()
     
     # Draw reference object
     cv2.drawContours(output, [reference_contour], 0, (0, 255, 0), 2)
     
-    # Get reference object center
-    M = cv2.moments(reference_contour)
-    if M["m00"] != 0:
-        cX_ref = int(M["m10"] / M["m00"])
-        cY_ref = int(M["m01"] / M["m00"])
+    # Get reference object center (from its rectangle if we have it, no need to scan the contour)
+    if ref_rect is not None:
+        cX_ref, cY_ref = map(int, ref_rect[0])
     else:
-        cX_ref, cY_ref = 0, 0
+        M = cv2.moments(reference_contour)
+        if M["m00"] != 0:
+            cX_ref = int(M["m10"] / M["m00"])
+            cY_ref = int(M["m01"] / M["m00"])
+        else:
+            cX_ref, cY_ref = 0, 0
     
     # Draw reference dimensions
     ref_text = f"Reference: {reference_dimensions[0]:.1f} x {reference_dimensions[1]:.1f} cm"
@@ -248,16 +366,19 @@ def draw_reference_and_measurements(image, reference_contour, object_contour, re
     # If we have the rectangle, draw the rotated bounding box
     if rect is not None:
         box = cv2.boxPoints(rect)
-        box = np.int0(box)
+        box = box.astype(np.int32, copy=False)
         cv2.drawContours(output, [box], 0, (255, 0, 0), 2)
     
     # Get object center
-    M = cv2.moments(object_contour)
-    if M["m00"] != 0:
-        cX_obj = int(M["m10"] / M["m00"])
-        cY_obj = int(M["m01"] / M["m00"])
+    if rect is not None:
+        cX_obj, cY_obj = map(int, rect[0])
     else:
-        cX_obj, cY_obj = 0, 0
+        M = cv2.moments(object_contour)
+        if M["m00"] != 0:
+            cX_obj = int(M["m10"] / M["m00"])
+            cY_obj = int(M["m01"] / M["m00"])
+        else:
+            cX_obj, cY_obj = 0, 0
     
     # Draw object dimensions
     obj_text = f"Object: {object_dimensions[0]:.1f} x {object_dimensions[1]:.1f} cm"
@@ -1,6 +1,14 @@
+from functools import lru_cache
+
 import cv2 as cv
 import numpy as np
-import matplotlib.pyplot as plt
+
+@lru_cache(maxsize=32)
+def _inverse_transform_matrix(actual_points_bytes, w, h, pad):
+    # maps the padded output directly to source coordinates, cached per set of corners (e.g. a static video frame)
+    actual_points = np.frombuffer(actual_points_bytes, dtype=np.float32).reshape(4, 2)
+    to_be_points = np.array([[0, 0], [w, 0], [0, h], [w, h]], dtype=np.float32) - pad
+    return cv.getPerspectiveTransform(to_be_points, actual_points)
 
 def perspective_transform(source_img, actual_points, pad=5):
     """
@@ -16,17 +24,13 @@ def perspective_transform(source_img, actual_points, pad=5):
     w = 210
     h = 297
 
-    to_be_points = np.array([[0, 0], [w, 0], [0, h], [w, h]], dtype=np.float32)
-
-    perspective_transform_matrix = cv.getPerspectiveTransform(
-        actual_points, to_be_points
+    inverse_matrix = _inverse_transform_matrix(
+        np.ascontiguousarray(actual_points, dtype=np.float32).tobytes(), w, h, pad
     )
-    perspective_transformed_img = cv.warpPerspective(
-        source_img, perspective_transform_matrix, (w, h)
+    # only the padded region is warped, the matrix already goes from output to source
+    padded_perspective_transformed_image = cv.warpPerspective(
+        source_img, inverse_matrix, (w - 2 * pad, h - 2 * pad),
+        flags=cv.INTER_LINEAR | cv.WARP_INVERSE_MAP
     )
 
-    padded_perspective_transformed_image = perspective_transformed_img[
-        pad : h - pad, pad : w - pad
-    ]
-
     return padded_perspective_transformed_image
@@ -1,22 +1,22 @@
 import cv2 as cv
 import numpy as np
-import matplotlib.pyplot as plt
 
 from calculate_dimensions import calculate_dimensions
-from matplotlib_imshow import matplotlib_imshow
 
-def visualize_detections(src, pts, return_dimensions=False):
+def visualize_detections(src, pts, return_dimensions=False, inplace=False):
     """
     src: image on which to draw the rotated rectangle and display the calculated width and height.
          should be BGR type image.
     pts: points array that outlines the object (to call the calculate_dimensions() function)
     return_dimensions: Whether to return calculated dimensions along with the image
+    inplace: draw on src itself instead of on a copy (when the caller doesn't need the original anymore)
 
     Returns:
         If return_dimensions is False: the modified image (BGR type)
         If return_dimensions is True: tuple (modified image, (width_cm, height_cm))
     """
-    src = src.copy()
+    if not inplace:
+        src = src.copy()
     box2d_obj, (w, h) = calculate_dimensions(pts)
     corner_points = cv.boxPoints(box2d_obj).astype(np.int32)
     cv.polylines(src, [corner_points], isClosed=True, color=(0, 255, 0), thickness=1)
@@ -26,9 +26,9 @@ def visualize_detections(src, pts, return_dimensions=False):
     height_cm = round(h/10, 1)
     
     # Create a small semi-transparent background for better text visibility
-    overlay = src.copy()
-    cv.rectangle(overlay, (5, 5), (130, 55), (255, 255, 255), -1)
-    cv.addWeighted(overlay, 0.6, src, 0.4, 0, src)
+    # (60% white over the (5, 5) - (130, 55) box, blended in place on that region only)
+    roi = src[5:56, 5:131]
+    cv.addWeighted(roi, 0.4, roi, 0, 0.6 * 255, roi)
     
     cv.putText(
         src,